@@ -1,6 +1,7 @@
 """This module contains the default constants for this plugin."""
 
 import os
+from pathlib import PurePath
 
 from .npc import BASE_PATH
 
@@ -10,3 +11,5 @@ HTML_PATH = BASE_PATH / "html"
 """Path to the HTML directory"""
 REL_HTML_PATH = os.path.relpath(HTML_PATH, BUILD_PATH)
 """Relative path from the :data:`BUILD_PATH` to the :data:`HTML_PATH`"""
+REL_HTML_URL = PurePath(REL_HTML_PATH).as_posix()
+"""Relative URL from the :data:`BUILD_PATH` to the :data:`HTML_PATH`, always uses forward slashes"""
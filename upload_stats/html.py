@@ -19,10 +19,28 @@ Example:
 
 import hashlib
 from base64 import urlsafe_b64encode
-from functools import reduce
-from typing import Any, Callable, List
-
-__all__ = ["tag", "readable_size", "id_string", "readable_size_html", "abbr", "a", "li", "mark", "small", "span"]
+from functools import lru_cache
+from html import escape
+from math import frexp
+from string import Formatter
+from typing import Any, Callable, Iterator, List, Mapping, Optional, Tuple
+
+__all__ = [
+    "tag",
+    "readable_size",
+    "id_string",
+    "readable_size_html",
+    "abbr",
+    "a",
+    "li",
+    "mark",
+    "small",
+    "span",
+    "compile_template",
+    "render_template",
+]
+
+_SIZE_UNITS = ("", "K", "M", "G", "T", "P", "E", "Z", "Y")
 
 
 def tag(_name: str, _content: str = "", **attributes: Any) -> str:
@@ -41,6 +59,12 @@ def tag(_name: str, _content: str = "", **attributes: Any) -> str:
     .. versionchanged:: 3.1.1 Prefix arguments with _ to avoid conflicts with
         html attributes. Fixing the <meta http-equiv="refresh" content="..." /> tag issue.
 
+    .. versionchanged:: 3.1.6 Nested tags are wrapped in a loop instead of calling
+        this function for every level.
+
+    .. versionchanged:: 3.1.6 Attribute values are HTML escaped. Fixing broken markup
+        for file names containing quotes.
+
     Args:
         _name (:obj:`str`): Tag name or a space-separated list of tag names to
             create nested tags. The inner most one will receive the content
@@ -51,15 +75,15 @@ def tag(_name: str, _content: str = "", **attributes: Any) -> str:
     Returns:
         :obj:`str`: HTML tag
     """
-    tags = _name.split()
+    *outer, inner = _name.split()
     if (tooltip := attributes.get("data_tooltip")) and "title" not in attributes:
         attributes["title"] = tooltip
-    if len(tags) > 1:
-        tags[-1] = tag(tags[-1], _content, **attributes)
-        return reduce(lambda c, o: tag(o, c), tags[::-1])
 
-    attrs = " ".join(map(lambda i: f'{i[0].replace("_", "-")}="{i[1]}"', attributes.items()))
-    return f"<{_name} {attrs}>{_content}</{_name}>"
+    attrs = " ".join(f'{key.replace("_", "-")}="{escape(str(value))}"' for key, value in attributes.items())
+    html = f"<{inner} {attrs}>{_content}</{inner}>"
+    for name in reversed(outer):
+        html = f"<{name} >{html}</{name}>"
+    return html
 
 
 def tagger(_name: str, required_attributes: List[str] = []) -> Callable[..., str]:
@@ -116,6 +140,9 @@ mark = tagger("mark")
 def readable_size(num: float, suffix: str = "B") -> str:
     """Convert a number of bytes to a human-readable size
 
+    .. versionchanged:: 3.1.6 The unit is derived from the binary exponent of the number
+        instead of dividing in a loop.
+
     Args:
         num (:obj:`float`): Number of bytes
         suffix (:obj:`str`, optional): Suffix for the size. Default is "B".
@@ -123,16 +150,18 @@ def readable_size(num: float, suffix: str = "B") -> str:
     Returns:
         :obj:`str`: Human-readable size
     """
-    for unit in ["", "K", "M", "G", "T", "P", "E", "Z"]:
-        if abs(num) < 1024.0:
-            return "%3.1f%s%s" % (num, unit, suffix)
-        num /= 1024.0
-    return "%.1f%s%s" % (num, "Y", suffix)
+    # Every unit is 2**10 times the previous one, so the binary exponent gives the unit
+    index = min(max((frexp(num)[1] - 1) // 10, 0), len(_SIZE_UNITS) - 1)
+    return "%3.1f%s%s" % (num / 1024.0**index, _SIZE_UNITS[index], suffix)
 
 
+@lru_cache(maxsize=8192)
 def id_string(string: str) -> str:
     """Generate a unique ID from a string
 
+    .. versionchanged:: 3.1.6 Results are cached as the same paths and usernames are
+        hashed on every build of the statistics page.
+
     Args:
         string (:obj:`str`): Input string
 
@@ -143,9 +172,13 @@ def id_string(string: str) -> str:
     return urlsafe_b64encode(hasher.digest()[:10]).decode("ascii")
 
 
+@lru_cache(maxsize=4096, typed=True)
 def readable_size_html(num: float) -> str:
     """Convet a number of bytes to a human-readable size with HTML tooltip
 
+    .. versionchanged:: 3.1.6 Results are cached as the same sizes show up in many rows
+        of the statistics page.
+
     Args:
         num (:obj:`float`): Number of bytes
 
@@ -153,3 +186,67 @@ def readable_size_html(num: float) -> str:
         :obj:`str`: Human-readable size with HTML tooltip
     """
     return abbr(readable_size(num), data_tooltip=format(num, ".2f") if isinstance(num, float) else num)
+
+
+def compile_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """Split a :meth:`str.format` template into literal text and field names
+
+    Example:
+
+        .. code-block:: python
+
+            print(compile_template("<b>{name}</b>"))
+            # Output: [('<b>', 'name'), ('</b>', None)]
+
+    .. versionadded:: 3.1.6 Added to stream the statistics page with :func:`render_template`.
+
+    Args:
+        template (:obj:`str`): Template with ``{field}`` placeholders
+
+    Returns:
+        :obj:`List` of :obj:`Tuple`: Literal text and the field name following it, if any
+
+    Raises:
+        :obj:`ValueError`: If a field uses a format spec or conversion, which are not supported
+    """
+    parts: List[Tuple[str, Optional[str]]] = []
+    for literal, field, format_spec, conversion in Formatter().parse(template):
+        if format_spec or conversion:
+            raise ValueError(f"Format spec and conversion are not supported: {{{field}}}")
+        parts.append((literal, field))
+    return parts
+
+
+def render_template(
+    template: List[Tuple[str, Optional[str]]], values: Mapping[str, Any], write: Callable[[str], Any]
+) -> None:
+    """Render a template compiled with :func:`compile_template` piece by piece
+
+    Values that are iterators (e.g. generators) are written chunk by chunk, all other
+    values are converted with :obj:`str`.
+
+    Example:
+
+        .. code-block:: python
+
+            with open("index.html", "w") as file:
+                render_template(compile_template("<b>{name}</b>"), {"name": "Foo"}, file.write)
+
+    .. versionadded:: 3.1.6 Added to stream the statistics page to disk.
+
+    Args:
+        template (:obj:`List` of :obj:`Tuple`): Compiled template
+        values (:obj:`typing.Mapping`): Values for the fields
+        write (:obj:`typing.Callable`): Called with each piece of the rendered template
+    """
+    for literal, field in template:
+        if literal:
+            write(literal)
+        if field is None:
+            continue
+        value = values[field]
+        if isinstance(value, Iterator):
+            for chunk in value:
+                write(chunk)
+        else:
+            write(str(value))
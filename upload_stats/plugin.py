@@ -10,19 +10,27 @@ the statistics page periodically.
 .. seealso:: :class:`npc.BasePlugin` for more information about the plugin class.
 """
 
+import gzip
+import heapq
 import json
+import os
 import sys
+import threading
+import time
 import webbrowser
+import zlib
 from base64 import urlsafe_b64encode
-from datetime import datetime
+from collections import deque
+from html import escape
+from operator import itemgetter
 from pathlib import Path
-from statistics import mean, median
+from statistics import fmean, median
 from tempfile import NamedTemporaryFile
 from textwrap import dedent
-from typing import Any, List, Optional, Tuple, TypedDict, Union
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterator, List, Literal, Optional, Tuple, TypedDict, Union
 
-from .defaults import BUILD_PATH, HTML_PATH, REL_HTML_PATH
-from .html import a, id_string, li, readable_size_html, small, span, tag
+from .defaults import BUILD_PATH, HTML_PATH, REL_HTML_URL
+from .html import a, compile_template, id_string, li, readable_size_html, render_template, small, span, tag
 from .npc import (
     NICOTINE_VERSION,
     BasePlugin,
@@ -36,10 +44,29 @@ from .npc import (
     command,
     startfile,
 )
-from .utils import create_m3u
+from .utils import AsyncWriter, create_m3u, dump_json, is_audio, load_json, read_json, unique_percentile
 
 __all__ = ["Plugin"]
 
+_DAY_KEYS = tuple((f"day_{index}", f"day_{index}_p") for index in range(7))
+
+_USER_ROW = """
+            <tr id="user-%s">
+                <td>%s</td>
+                <td>%s</td>
+                <td sorttable_customkey="%s">%s</td>
+                <td><a href="#file-%s" data-tooltip="%s" data-tooltip-align="left" title="%s">%s</a></td>
+            </tr>"""
+
+_FILE_ROW = """
+            <tr id="file-%s">
+                <td><a data-tooltip="%s" href="file:///%s" target="_blank" data-tooltip-align="left" title="%s">%s</a></td>
+                <td>%s</td>
+                <td sorttable_customkey="%s">%s</td>
+                <td sorttable_customkey="%s">%s</td>
+                <td><a href="#user-%s">%s</a></td>
+            </tr>"""
+
 
 class Stats(TypedDict):
     """Statistics data structure."""
@@ -58,8 +85,15 @@ class Plugin(BasePlugin):
     Attributes:
         config (:obj:`Config`): Plugin configuration
         stats (:obj:`upload_stats.Stats`): Statistics data
-        empty_stats (:obj:`upload_stats.Stats`): Empty statistics data
+        stats_version (:obj:`int`): Incremented on every change of the statistics
+        stats_lock (:obj:`threading.RLock`): Lock held while the statistics are changed
+            or copied
+        latest_version (:obj:`typing.Any`): Newer version available, if any, as found by
+            the last update check
         auto_builder (:obj:`upload_stats.npc.PeriodicJob`): Auto builder job
+        update_checker (:obj:`upload_stats.npc.PeriodicJob`): Update checker job
+        writer (:obj:`upload_stats.utils.AsyncWriter`): Background writer for the
+            statistics file
     """
 
     class Config(BasePlugin.Config):
@@ -75,6 +109,8 @@ class Plugin(BasePlugin):
             playlist_file (:obj:`pathlib.Path`): Path to playlist file
             backup_folder (:obj:`pathlib.Path`): Path to backup folder
             backup_interval (:obj:`int`): Auto backup interval
+            max_backups (:obj:`int`): Maximum number of backups to keep
+            save_interval (:obj:`int`): Delay for saving the statistics after an upload
             build_interval (:obj:`int`): Rebuild interval
             dark_theme (:obj:`bool`): Dark theme
             auto_refresh (:obj:`bool`): Auto refresh
@@ -93,6 +129,16 @@ class Plugin(BasePlugin):
 
         backup_folder = File("Path to backup folder", default=BUILD_PATH / "backups")
         backup_interval = Int("Auto backup every x hours", default=24)
+        max_backups = Int(
+            "Maximum number of backups",
+            description="Older backups are deleted when a new backup is created. Use 0 to keep all backups.",
+            default=0,
+        )
+        save_interval = Int(
+            "Save statistics every x seconds",
+            description="Uploads in between are saved together. Use 0 to save after every upload.",
+            default=30,
+        )
         build_interval = Int("Rebuild statistics page every x minutes", default=30)
 
         dark_theme = Bool("Dark Theme", default=True)
@@ -114,23 +160,99 @@ class Plugin(BasePlugin):
             default=5,
         )
 
-    stats = Stats({"file": {}, "user": {}, "day": [0, 0, 0, 0, 0, 0, 0]})
-    empty_stats = stats.copy()
+    stats: Stats
     reset_flag = False
+    stats_version = 0
+    _built_version: Optional[int] = None
+    _sorted_cache: Dict[str, Tuple[int, List[Tuple[str, Dict[str, Any]]]]]
+    _threshold_cache: Dict[str, Tuple[int, int]]
+    _name_cache: Dict[str, str]
+    _html_name_cache: Dict[str, str]
+    _base64_cache: Dict[str, Tuple[float, int, str]]
+    _template: List[Tuple[str, Optional[str]]]
+    _icons: str
+    latest_version: Any = None
+    _top_files: Optional[Dict[str, int]] = None
+    _unsaved_changes = 0
+    _summary_cache: Optional[Tuple[int, str]] = None
+    _last_save = 0.0
+    _update_checked = False
+    _journal: Optional[BinaryIO] = None
+    _journal_lock: threading.Lock
+    _journal_pending: Deque[bytes]
+    _journal_generation = 0
+    _save_timer: Optional[threading.Timer] = None
+
+    SAVE_MAX_CHANGES = 50
+    """:obj:`int`: Number of changes after which they are saved by :meth:`request_save`"""
+    PLAYLIST_SIZE = 25
+    """:obj:`int`: Number of files in the playlist"""
+    UPDATE_CHECK_INTERVAL = 6 * 3600
+    """:obj:`int`: Seconds between update checks for the statistics page"""
+    UPDATE_CHECK_DELAY = 30
+    """:obj:`int`: Seconds after enabling the plugin before the first update check"""
+
+    BASE64_MAX_SIZE = 1024 * 1024
+    """:obj:`int`: Maximum file size in bytes to embed as base64 data link in :meth:`file_link`"""
 
     config: Config
 
+    @staticmethod
+    def empty_stats() -> Stats:
+        """Create empty statistics data
+
+        .. versionchanged:: 3.1.6 Turned into a method creating new statistics each time.
+            The shallow copy used before shared its lists and dicts with the initial
+            statistics, so a reset could bring back old counters and entries.
+
+        Returns:
+            :obj:`upload_stats.Stats`: Empty statistics data
+        """
+        return Stats({"file": {}, "user": {}, "day": [0, 0, 0, 0, 0, 0, 0]})
+
+    def snapshot_stats(self) -> Tuple[int, Stats]:
+        """Create a shallow copy of the statistics
+
+        Uploads are tracked on the Nicotine+ thread while the statistics are read by
+        the jobs. The entries themselves are replaced instead of changed on updates,
+        so a shallow copy is consistent.
+
+        .. versionadded:: 3.1.6 Added to read the statistics safely from other threads.
+
+        Returns:
+            :obj:`Tuple` of :obj:`int` and :obj:`upload_stats.Stats`: The
+            :attr:`stats_version` and the copy of the statistics
+        """
+        with self.stats_lock:
+            return self.stats_version, Stats(
+                {"file": dict(self.stats["file"]), "user": dict(self.stats["user"]), "day": list(self.stats["day"])}
+            )
+
     def init(self) -> None:
         """Initialize the plugin
 
         .. seealso:: :meth:`npc.BasePlugin.init` for more information.
 
+        * Start the background writer
+        * Load the template and icons of the statistics page
         * Load the statistics from a file
         * Start the auto builder job
         * Start the auto backup job
+        * Start the update checker job
         """
         super().init()
-        self.load_stats()
+        self.stats = self.empty_stats()
+        self.stats_lock = threading.RLock()
+        self._journal_lock = threading.Lock()
+        self._journal_pending = deque()
+        self._sorted_cache = {}
+        self._threshold_cache = {}
+        self._name_cache = {}
+        self._html_name_cache = {}
+        self._base64_cache = {}
+        self.load_assets()
+        self.writer = AsyncWriter(name="StatsWriter", log=self.log)
+        self.writer.start()
 
         self.auto_builder = PeriodicJob(
             name="AutoBuilder",
@@ -143,21 +265,39 @@ class Plugin(BasePlugin):
             update=self.automatic_backup,
         )
 
+        self.update_checker = PeriodicJob(
+            name="UpdateChecker",
+            delay=lambda: self.UPDATE_CHECK_INTERVAL if self._update_checked else self.UPDATE_CHECK_DELAY,
+            update=self.check_latest_version,
+        )
+
         if self.load_stats():
             self.auto_builder.start()
             self.auto_backup.start()
+        self.update_checker.start()
 
     def load_stats(self) -> bool:
         """Load the statistics from a file
 
+        .. versionchanged:: 3.1.6 Use :mod:`orjson` if it is installed. Large files are
+            parsed from a memory map, see :func:`upload_stats.utils.read_json`.
+
+        .. versionchanged:: 3.1.6 Changes that were not saved before Nicotine+ stopped are
+            restored from the journal, see :meth:`journal_upload`.
+
         Returns:
             :obj:`bool`: True if the statistics were loaded successfully, False otherwise.
         """
         self.log.info(f'Loading statistics from "{self.config.stats_file}"')
         try:
             if self.config.stats_file.exists():
-                stats = json.loads(self.config.stats_file.read_text(encoding="utf-8"))
+                stats = read_json(self.config.stats_file)
                 self.stats.update(stats)
+                if changes := self.replay_journal():
+                    self.log.info(f"Restored {changes} unsaved changes from the journal")
+                    self.save_stats(wait=True)
+                self.stats_version += 1
+                self._top_files = None
             else:
                 self.log.warning(f'Statistics file does not exist yet. Creating "{self.config.stats_file}"')
                 self.save_stats()
@@ -201,21 +341,195 @@ class Plugin(BasePlugin):
             self.auto_builder.pause()
         if hasattr(self, "auto_backup"):
             self.auto_backup.pause()
+        if hasattr(self, "update_checker"):
+            self.update_checker.pause()
 
-    def save_stats(self, path: Optional[Path] = None) -> None:
+    def save_stats(self, path: Optional[Path] = None, wait: bool = False) -> None:
         """Save the statistics to a file
 
+        .. versionchanged:: 3.1.6 The file is written atomically in the background
+            by :attr:`writer`. Paths ending in ``.gz`` are gzip compressed. Use
+            :mod:`orjson` if it is installed.
+
+        .. versionchanged:: 3.1.6 Saving the statistics file rotates the journal, which is
+            removed once the file is written.
+
         Args:
             path (:obj:`pathlib.Path`, optional): Path to the file. Default is None.
+            wait (:obj:`bool`, optional): Wait until the file is written. Default is False.
         """
         path = path or self.config.stats_file
         self.log.debug(f'Saving statistics to "{path}"')
-        if not path.parent.exists():
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.touch()
-            self.log.debug(f'Created missing file "{path}"')
-        path.write_text(json.dumps(self.stats, ensure_ascii=False), encoding="utf-8")
-        self.log.debug(f'Saved statistics to "{path}"')
+        callback = None
+        with self.stats_lock:
+            if path == self.config.stats_file:
+                self._unsaved_changes = 0
+                self._last_save = time.monotonic()
+                callback = self.rotate_journal()
+            stats = self.snapshot_stats()[1]
+        data = dump_json(stats)
+        if path.suffix == ".gz":
+            data = gzip.compress(data, compresslevel=1)
+        self.writer.write(path, data, callback)
+        if wait:
+            self.writer.flush()
+            self.log.debug(f'Saved statistics to "{path}"')
+
+    def journal_files(self) -> Tuple[Path, Path]:
+        """Get the paths of the journal
+
+        .. versionadded:: 3.1.6 Added for the journal of unsaved changes.
+
+        Returns:
+            :obj:`Tuple` of :obj:`pathlib.Path`: The current journal and the rotated journal
+            waiting for the statistics file to be written
+        """
+        journal = self.config.stats_file.with_name(self.config.stats_file.name + ".log")
+        return journal, journal.with_name(journal.name + ".1")
+
+    def journal_upload(self, user: str, real_path: str, weekday: int) -> None:
+        """Queue an upload for the journal
+
+        The statistics file is only rewritten every now and then by :meth:`request_save`.
+        Each upload is appended to the journal in the meantime, so no uploads are lost if
+        Nicotine+ is killed. The records contain the new values instead of the increments,
+        which makes replaying them with :meth:`replay_journal` safe to repeat.
+
+        Must be called while holding :attr:`stats_lock`, so the records are queued in the
+        order of the changes. They are written by :meth:`write_journal`.
+
+        .. versionadded:: 3.1.6 Added to only write the changed entries on every upload.
+
+        Args:
+            user (:obj:`str`): User who uploaded the file
+            real_path (:obj:`str`): Real path of the file
+            weekday (:obj:`int`): Day of the week of the upload
+        """
+        record = {
+            "file": [real_path, self.stats["file"][real_path]],
+            "user": [user, self.stats["user"][user]],
+            "day": [weekday, self.stats["day"][weekday]],
+        }
+        self._journal_pending.append(dump_json(record) + b"\n")
+
+    def write_journal(self) -> None:
+        """Write the queued records to the journal
+
+        Does not need :attr:`stats_lock`, so uploads are not blocked by the disk.
+
+        .. versionadded:: 3.1.6 Added for the journal of unsaved changes.
+        """
+        with self._journal_lock:
+            lines = []
+            while self._journal_pending:
+                lines.append(self._journal_pending.popleft())
+            if not lines:
+                return
+            try:
+                if self._journal is None:
+                    journal = self.journal_files()[0]
+                    journal.parent.mkdir(parents=True, exist_ok=True)
+                    self._journal = journal.open("ab")
+                self._journal.write(b"".join(lines))
+                self._journal.flush()
+            except OSError as e:
+                self.log.warning(f"Could not write to the journal: {e}")
+
+    def rotate_journal(self) -> Callable[[], None]:
+        """Move the current journal aside before the statistics are saved
+
+        .. versionadded:: 3.1.6 Added for the journal of unsaved changes.
+
+        Returns:
+            :obj:`typing.Callable`: Removes the rotated journal, to be called once the
+            statistics file is written
+        """
+        with self.stats_lock:
+            # The queued records belong to the journal that is being rotated
+            self.write_journal()
+            with self._journal_lock:
+                if self._journal:
+                    self._journal.close()
+                    self._journal = None
+
+            journal, rotated = self.journal_files()
+            try:
+                if journal.exists():
+                    if rotated.exists():
+                        # The previous save is still pending, keep its records as well
+                        with rotated.open("ab") as file:
+                            file.write(journal.read_bytes())
+                        journal.unlink()
+                    else:
+                        os.replace(journal, rotated)
+            except OSError as e:
+                self.log.warning(f"Could not rotate the journal: {e}")
+
+            self._journal_generation += 1
+            generation = self._journal_generation
+
+        def remove() -> None:
+            with self.stats_lock:
+                # Newer records may have been added to the rotated journal in the meantime
+                if generation == self._journal_generation:
+                    rotated.unlink(missing_ok=True)
+
+        return remove
+
+    def replay_journal(self) -> int:
+        """Apply the changes in the journal to the statistics
+
+        Incomplete records, e.g. from a crash in the middle of a write, are skipped.
+
+        .. versionadded:: 3.1.6 Added for the journal of unsaved changes.
+
+        Returns:
+            :obj:`int`: Number of replayed changes
+        """
+        changes = 0
+        for path in reversed(self.journal_files()):
+            if not path.exists():
+                continue
+            for line in path.read_bytes().splitlines():
+                try:
+                    record = load_json(line)
+                    self.stats["file"][record["file"][0]] = record["file"][1]
+                    self.stats["user"][record["user"][0]] = record["user"][1]
+                    self.stats["day"][record["day"][0]] = record["day"][1]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    self.log.warning(f'Skipping incomplete record in journal "{path}"')
+                    continue
+                changes += 1
+        return changes
+
+    def request_save(self) -> None:
+        """Save the statistics if enough changes accumulated
+
+        The statistics are saved after :attr:`SAVE_MAX_CHANGES` changes or if the
+        last save is at least :attr:`Config.save_interval` seconds ago. Otherwise a
+        timer saves the remaining changes with :meth:`flush_stats` once the interval
+        is over.
+
+        .. versionadded:: 3.1.6 Added to not rewrite the statistics file on every upload.
+        """
+        with self.stats_lock:
+            self._unsaved_changes += 1
+            remaining = self.config.save_interval - (time.monotonic() - self._last_save)
+            if self._unsaved_changes >= self.SAVE_MAX_CHANGES or remaining <= 0:
+                self.save_stats()
+            elif not (self._save_timer and self._save_timer.is_alive()):
+                self._save_timer = threading.Timer(remaining, self.flush_stats)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush_stats(self) -> None:
+        """Save the statistics if there are unsaved changes
+
+        .. versionadded:: 3.1.6 Added to save changes held back by :meth:`request_save`.
+        """
+        with self.stats_lock:
+            if self._unsaved_changes:
+                self.save_stats()
 
     @command
     def reset(self) -> None:
@@ -258,6 +572,11 @@ class Plugin(BasePlugin):
     def backup(self, reason: str) -> Path:
         """Create a backup of the statistics
 
+        .. versionchanged:: 3.1.6 Backups are gzip compressed.
+
+        .. versionchanged:: 3.1.6 Fixed the month in the backup file name, it used the
+            minutes instead.
+
         Args:
             reason (:obj:`str`): Reason for the backup
 
@@ -265,15 +584,22 @@ class Plugin(BasePlugin):
             :obj:`pathlib.Path`: Path to the backup file
         """
         self.log.info(f'Creating a backup for "{reason}"')
-        file = self.config.backup_folder / (f"stats-{reason}-{datetime.now().strftime('%Y_%M_%d-%H_%M_%S')}.json")
-        self.save_stats(file)
+        file = self.config.backup_folder / (f"stats-{reason}-{time.strftime('%Y_%m_%d-%H_%M_%S')}.json.gz")
+        self.save_stats(file, wait=True)
         self.log.info(f'Created a backup at "{file}"')
+        self.prune_backups()
         return file
 
     def hard_reset(self) -> None:
         """Reset the statistics to the default values"""
         self.log.info("Resetting statistics")
-        self.stats = self.empty_stats.copy()
+        with self.stats_lock:
+            self.stats = self.empty_stats()
+            self.stats_version += 1
+            self._top_files = None
+            self._name_cache.clear()
+            self._html_name_cache.clear()
+            self._base64_cache.clear()
         self.save_stats()
         self.rebuild_page()
         self.rebuild_playlist()
@@ -315,12 +641,44 @@ class Plugin(BasePlugin):
         """Create a backup of the statistics"""
         self.backup("manual")
 
+    def sorted_backups(self) -> List[Path]:
+        """Get all backups sorted from newest to oldest
+
+        .. versionadded:: 3.1.6 Shared by :meth:`list_backups`, :meth:`restore` and
+            the backup pruning.
+
+        Returns:
+            :obj:`List` of :obj:`pathlib.Path`: Backup files
+        """
+        if not self.config.backup_folder.is_dir():
+            return []
+
+        with os.scandir(self.config.backup_folder) as entries:
+            backups = [
+                (entry.stat().st_mtime, Path(entry.path))
+                for entry in entries
+                if entry.name.startswith("stats-") and entry.name.endswith((".json", ".json.gz"))
+            ]
+        backups.sort(key=itemgetter(0), reverse=True)
+        return [path for _, path in backups]
+
+    def prune_backups(self) -> None:
+        """Delete the oldest backups exceeding :attr:`Config.max_backups`
+
+        .. versionadded:: 3.1.6 Added to cap the size of the backup folder.
+        """
+        if self.config.max_backups <= 0:
+            return
+
+        for file in self.sorted_backups()[self.config.max_backups :]:
+            self.log.info(f'Deleting old backup "{file}"')
+            file.unlink(missing_ok=True)
+
     @command
     def list_backups(self) -> None:
         """List all backups"""
         self.log.info("Listing all backups")
-        backups: List[Path] = list(self.config.backup_folder.glob("stats-*.json"))
-        backups = sorted(backups, reverse=True, key=lambda i: i.stat().st_mtime)
+        backups = self.sorted_backups()
         if not backups:
             self.log.error("No backups found")
             self.window("No backups found", title="Error")
@@ -333,12 +691,14 @@ class Plugin(BasePlugin):
     def restore(self, file: Optional[Union[str, Path]] = None) -> None:
         """Restore the latest backup
 
+        .. versionchanged:: 3.1.6 Support gzip compressed backups.
+
+        .. versionchanged:: 3.1.6 The backup of the current statistics is created
+            after the chosen backup was read, so pruning can't delete it beforehand.
+
         Args:
             file (:obj:`str`, optional): Backup file to restore. Default is None.
         """
-        # Backup current stats
-        new_backup = self.backup("restore")
-
         # Choose backup file
         if file:
             file = Path(file)
@@ -348,28 +708,38 @@ class Plugin(BasePlugin):
                     self.log.error(f'Backup file "{file}" not found')
                     self.window(f'Backup file "{file}" not found', title="Error")
                     return
-            self.log.info(f'Restoring backup "{file}"')
         else:
-            backups: List[Path] = list(self.config.backup_folder.glob("stats-*.json"))
-            backups = sorted(backups, reverse=True, key=lambda i: i.stat().st_mtime)
-            backups = [file for file in backups if file != new_backup]
-
+            backups = self.sorted_backups()
             if not backups:
                 self.log.error("No backups found")
                 self.window("No backups found", title="Error")
                 return
-
             file = backups[0]
-            self.log.info(f'Restoring backup "{file}"')
 
-        # Restore backup
+        self.log.info(f'Restoring backup "{file}"')
+
+        # Read backup
         try:
-            self.stats = json.loads(file.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            self.log.error(f'Could not parse backup file "{file}"')
+            data = file.read_bytes()
+            if file.suffix == ".gz":
+                data = gzip.decompress(data)
+            stats = load_json(data)
+        except (ValueError, OSError, EOFError, zlib.error) as e:
+            # ValueError includes JSON and UTF-8 decoding errors, OSError includes gzip.BadGzipFile
+            self.log.error(f'Could not parse backup file "{file}": {e}')
             self.window(f'Could not parse backup file "{file}"', title="Error")
             return
 
+        # Backup current stats and restore backup
+        self.backup("restore")
+        with self.stats_lock:
+            self.stats = stats
+            self.stats_version += 1
+            self._top_files = None
+            self._name_cache.clear()
+            self._html_name_cache.clear()
+            self._base64_cache.clear()
+
         self.save_stats()
         self.rebuild_page()
         self.rebuild_playlist()
@@ -380,7 +750,11 @@ class Plugin(BasePlugin):
     # === Build ===
 
     def rebuild_stats_output(self) -> None:
-        """Rebuild the statistics page and playlist file"""
+        """Rebuild the statistics page and playlist file
+
+        .. versionchanged:: 3.1.6 Save unsaved changes first.
+        """
+        self.flush_stats()
         self.rebuild_page()
         self.rebuild_playlist()
 
@@ -394,7 +768,7 @@ class Plugin(BasePlugin):
             user_threshold (:obj:`int`, optional): User threshold
             file_threshold (:obj:`int`, optional): File threshold
         """
-        self.rebuild_page(user_threshold, file_threshold)
+        self.rebuild_page(user_threshold, file_threshold, force=True)
         self.rebuild_playlist()
 
     @command("rebuild-page", parameters=["[user threshold]", "[file threshold]"])
@@ -405,55 +779,155 @@ class Plugin(BasePlugin):
             user_threshold (:obj:`int`, optional): User threshold
             file_threshold (:obj:`int`, optional): File threshold
         """
-        self.rebuild_page(user_threshold, file_threshold)
+        self.rebuild_page(user_threshold, file_threshold, force=True)
 
     @command("rebuild-playlist")
     def rebuild_playlist_cmd(self) -> None:
         """Rebuild the playlist file"""
         self.rebuild_playlist()
 
-    def rebuild_page(self, user_threshold: Optional[int] = None, file_threshold: Optional[int] = None) -> None:
+    def load_assets(self) -> None:
+        """Load the template and icons of the statistics page
+
+        .. versionadded:: 3.1.6 The assets don't change at runtime, so they are loaded
+            once instead of on every build.
+        """
+        self._template = compile_template((HTML_PATH / "template.html").read_text(encoding="utf-8"))
+        self._icons = self.icons()
+
+    @command
+    def reload_assets(self) -> None:
+        """Reload the template and icons of the statistics page and rebuild it"""
+        self.load_assets()
+        self.rebuild_page(force=True)
+
+    def rebuild_page(
+        self, user_threshold: Optional[int] = None, file_threshold: Optional[int] = None, force: bool = False
+    ) -> None:
         """Rebuild the statistics page
 
+        .. versionchanged:: 3.1.6 Skip the rebuild if the statistics did not change
+            since the last build, unless :paramref:`force` is set.
+
+        .. versionchanged:: 3.1.6 The page is streamed to disk with :meth:`render_html`.
+
         Args:
             user_threshold (:obj:`int`, optional): User threshold
             file_threshold (:obj:`int`, optional): File threshold
+            force (:obj:`bool`, optional): Rebuild even if the statistics did not change.
+                Default is False.
         """
+        if (
+            not force
+            and user_threshold is file_threshold is None
+            and self._built_version == self.stats_version
+            and self.config.stats_html_file.exists()
+        ):
+            self.log.debug("Statistics did not change since the last build, skipping rebuild")
+            return
+
         self.log.info("Rebuilding statistics page")
 
         if user_threshold or file_threshold:
             self.log.info(f"Creating temporary HTML file with thresholds: user={user_threshold}, file={file_threshold}")
-            with NamedTemporaryFile("w", suffix=".html", delete=False) as file:
-                file.write(self.build_html(user_threshold, file_threshold))
+            with NamedTemporaryFile("w", suffix=".html", delete=False, encoding="utf-8") as file:
+                self.render_html(file.write, user_threshold, file_threshold)
                 self.log.info(f'Temporary statistics page created at "{file.name}"')
                 return
 
-        if not self.config.stats_html_file.exists():
-            self.log.info(f'File "{self.config.stats_html_file}" does not exist. Creating a new one.')
-            self.config.stats_html_file.parent.mkdir(parents=True, exist_ok=True)
-            self.config.stats_html_file.touch()
+        path = self.config.stats_html_file
+        if not path.exists():
+            self.log.info(f'File "{path}" does not exist. Creating a new one.')
+            path.parent.mkdir(parents=True, exist_ok=True)
 
-        self.config.stats_html_file.write_text(self.build_html(), encoding="utf-8")
-        self.log.info(f'Statistics page generated and saved to "{self.config.stats_html_file}"')
+        # Uploads during the build are not necessarily on the page, so they must not count as built
+        version = self.stats_version
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as file:
+            self.render_html(file.write)
+        os.replace(tmp, path)
+        self._built_version = version
+        self.log.info(f'Statistics page generated and saved to "{path}"')
 
-    def rebuild_playlist(self, total: int = 25) -> None:
+    def rebuild_playlist(self, total: int = PLAYLIST_SIZE) -> None:
         """Rebuild the playlist
 
+        .. versionchanged:: 3.1.6 Use the incrementally updated :meth:`top_files`
+            instead of sorting all files.
+
         Args:
             total (:obj:`int`, optional): Top number of files to include in the playlist.
                 Default is 25.
         """
         self.log.info(f"Rebuilding playlist with top {total} uploads")
-        songs = sorted(self.stats["file"], reverse=True, key=lambda i: self.stats["file"][i]["total"])
+        songs = self.top_files(total)
         file = self.config.playlist_file
         create_m3u(title=f"TOP #{total}", files=songs, out_file=file, max_files=total)
         self.log.info(f'Playlist generated and saved to "{file}"')
 
+    def top_files(self, total: int = PLAYLIST_SIZE) -> List[str]:
+        """Get the most uploaded audio files
+
+        The top :attr:`PLAYLIST_SIZE` files are kept up to date by
+        :meth:`track_file_upload`, so they only have to be searched for after the
+        statistics were replaced or if more files are requested.
+
+        .. versionadded:: 3.1.6 Added to avoid scanning all files for the playlist.
+
+        Args:
+            total (:obj:`int`, optional): Number of files. Default is 25.
+
+        Returns:
+            :obj:`List` of :obj:`str`: Paths of the files, most uploads first
+        """
+        with self.stats_lock:
+            if self._top_files is not None and total <= self.PLAYLIST_SIZE:
+                top_files = dict(self._top_files)
+                return heapq.nlargest(total, top_files, key=top_files.__getitem__)
+            version = self.stats_version
+            files = dict(self.stats["file"])
+
+        top = heapq.nlargest(max(total, self.PLAYLIST_SIZE), filter(is_audio, files), key=lambda i: files[i]["total"])
+        with self.stats_lock:
+            # Uploads during the search are not tracked while there are no top files
+            if self.stats_version == version:
+                self._top_files = {path: files[path]["total"] for path in top[: self.PLAYLIST_SIZE]}
+        return top[:total]
+
+    def _update_top_files(self, path: str, total: int) -> None:
+        """Update the top files kept for :meth:`top_files`
+
+        As totals only ever increase, a file can only enter the top files by
+        surpassing the current lowest one.
+
+        Args:
+            path (:obj:`str`): Real path of the file
+            total (:obj:`int`): New total uploads of the file
+        """
+        top = self._top_files
+        if top is None or not is_audio(path):
+            return
+
+        if path in top or len(top) < self.PLAYLIST_SIZE:
+            top[path] = total
+            return
+
+        lowest = min(top, key=top.__getitem__)
+        if total > top[lowest]:
+            del top[lowest]
+            top[path] = total
+
     def build_html(self, user_threshold: Optional[int] = None, file_threshold: Optional[int] = None) -> str:
         """Build the statistics page
 
         .. versionchanged:: 3.1.2 Added version of Plugin, Nicotine+ and Python to the page.
 
+        .. versionchanged:: 3.1.6 Use the result of the last update check instead of
+            checking for updates on every build.
+
+        .. seealso:: :meth:`render_html` to write the page without building the whole
+            string in memory.
+
         Args:
             user_threshold (:obj:`int`, optional): User threshold
             file_threshold (:obj:`int`, optional): File threshold
@@ -461,12 +935,31 @@ class Plugin(BasePlugin):
         Returns:
             :obj:`str`: HTML page
         """
-        self.log.debug("Building statistics page")
-        template = (HTML_PATH / "template.html").read_text(encoding="utf-8")
+        parts: List[str] = []
+        self.render_html(parts.append, user_threshold, file_threshold)
+        return "".join(parts)
+
+    def render_html(
+        self,
+        write: Callable[[str], Any],
+        user_threshold: Optional[int] = None,
+        file_threshold: Optional[int] = None,
+    ) -> None:
+        """Render the statistics page piece by piece
+
+        .. versionadded:: 3.1.6 Added to stream the page to disk.
 
+        .. seealso:: :meth:`load_assets` to load changes of the template and icons.
+
+        Args:
+            write (:obj:`typing.Callable`): Called with each piece of the page
+            user_threshold (:obj:`int`, optional): User threshold
+            file_threshold (:obj:`int`, optional): File threshold
+        """
+        self.log.debug("Building statistics page")
         info: dict[str, Any] = {
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "BASE": str(REL_HTML_PATH).replace("\\", "/") + "/",
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "BASE": REL_HTML_URL + "/",
             "DARK_THEME": "checked" if self.config.dark_theme else "",
             "head": "",
             "update": "",
@@ -475,7 +968,7 @@ class Plugin(BasePlugin):
             "playlist_file": self.file_link(self.config.playlist_file, as_base64=True),
             "userranking": self.user_ranking(),
             "fileranking": self.file_ranking(),
-            "icons": self.icons(),
+            "icons": self._icons,
             "version": __version__,
             "nicotine_version": NICOTINE_VERSION,
             "python_version": sys.version.split()[0],
@@ -484,7 +977,7 @@ class Plugin(BasePlugin):
         if self.config.auto_refresh and user_threshold is file_threshold is None:
             info["head"] = tag("meta", http_equiv="refresh", content="60")
 
-        if new_version := self._check_update():
+        if new_version := self.latest_version:
             update_url = "https://github.com/Nachtalb/more-upload-stats/releases/latest"
 
             info["update"] = tag(
@@ -496,10 +989,11 @@ class Plugin(BasePlugin):
                 target="_blank",
             )
 
-        max_day = max(self.stats["day"]) or 1
-        for index, day in enumerate(self.stats["day"]):
-            info[f"day_{index}"] = day
-            info[f"day_{index}_p"] = 3 + (97 / max_day * day)
+        days = list(self.stats["day"])
+        scale = 97 / (max(days) or 1)
+        for (count_key, percent_key), day in zip(_DAY_KEYS, days):
+            info[count_key] = day
+            info[percent_key] = 3 + scale * day
 
         user_threshold = self.user_threshold() if user_threshold is None else user_threshold
         file_threshold = self.file_threshold() if file_threshold is None else file_threshold
@@ -507,48 +1001,73 @@ class Plugin(BasePlugin):
             {
                 "user_threshold": user_threshold,
                 "file_threshold": file_threshold,
-                "userstats": self.user_stats(user_threshold),
-                "filestats": self.file_stats(file_threshold),
+                "userstats": self.user_rows(user_threshold),
+                "filestats": self.file_rows(file_threshold),
             }
         )
 
-        return template.format(**info)
+        render_template(self._template, info, write)
 
     def calculate_summary(self) -> str:
         """Calculate the statistics summary
 
+        The result is cached until the statistics change.
+
+        .. versionchanged:: 3.1.6 Cache the summary.
+
         Returns:
             :obj:`str`: HTML summary
         """
+        if self._summary_cache and self._summary_cache[0] == self.stats_version:
+            return self._summary_cache[1]
+
         self.log.debug("Calculating summary")
-        users, files = self.stats["user"].values(), self.stats["file"].values()
+        with self.stats_lock:
+            version = self.stats_version
+            users, files = list(self.stats["user"].values()), list(self.stats["file"].values())
         total_users = len(users)
         total_files = len(files)
 
-        bytes_per_user: List[int] = [user["total_bytes"] for user in users if user.get("total_bytes")] or [0]
-        files_per_user: List[int] = [user["total"] for user in users] or [0]
-
-        average_bytes_user = readable_size_html(mean(bytes_per_user))
+        bytes_per_user: List[int] = []
+        files_per_user: List[int] = []
+        for user in users:
+            files_per_user.append(user["total"])
+            if user_bytes := user.get("total_bytes"):
+                bytes_per_user.append(user_bytes)
+
+        total_uploads_per_file: List[int] = []
+        total_bytes_per_file: List[int] = []
+        file_size: List[int] = []
+        for file in files:
+            if uploads := file.get("total"):
+                total_uploads_per_file.append(uploads)
+            if file_bytes := file.get("total_bytes"):
+                total_bytes_per_file.append(file_bytes)
+            if size := file.get("file_size"):
+                file_size.append(size)
+
+        bytes_per_user = bytes_per_user or [0]
+        files_per_user = files_per_user or [0]
+        total_uploads_per_file = total_uploads_per_file or [0]
+        total_bytes_per_file = total_bytes_per_file or [0]
+        file_size = file_size or [0]
+
+        average_bytes_user = readable_size_html(fmean(bytes_per_user))
         median_bytes_user = readable_size_html(median(bytes_per_user))
-        average_files_user = format(mean(files_per_user), ".2f")
+        average_files_user = format(fmean(files_per_user), ".2f")
         median_files_user = median(files_per_user)
 
-        total_uploads_per_file: List[int] = [file["total"] for file in files if file.get("total")] or [0]
-        total_bytes_per_file: List[int] = [file["total_bytes"] for file in files if file.get("total_bytes")] or [0]
-
         total_uploads = sum(total_uploads_per_file)
         total_bytes = readable_size_html(sum(total_bytes_per_file))
 
-        file_size: List[int] = [file["file_size"] for file in files if file.get("file_size")] or [0]
-
-        average_filesize = readable_size_html(mean(file_size))
+        average_filesize = readable_size_html(fmean(file_size))
         median_filesize = readable_size_html(median(file_size))
-        average_bytes = readable_size_html(mean(total_bytes_per_file))
+        average_bytes = readable_size_html(fmean(total_bytes_per_file))
         median_bytes = readable_size_html(median(total_bytes_per_file))
-        average_uploads_file = format(mean(total_uploads_per_file), ".2f")
+        average_uploads_file = format(fmean(total_uploads_per_file), ".2f")
         median_uploads_files = median(total_uploads_per_file)
 
-        return f"""
+        summary = f"""
         <dl>
           <dt>Total unique Users:</dt>
           <dd>{total_users}</dd>
@@ -572,6 +1091,8 @@ class Plugin(BasePlugin):
           <dd>Median Uploads: {median_uploads_files}</dd>
         </dl>
         """
+        self._summary_cache = (version, summary)
+        return summary
 
     def user_threshold(self) -> int:
         """Calculate the user threshold
@@ -579,54 +1100,106 @@ class Plugin(BasePlugin):
         If automatic_threshold is enabled, the 25th percentile is used as the threshold,
         unless the user stats are empty, then 0 is returned.
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`automatic_threshold`.
+
         Returns:
             int: The user threshold
         """
         if self.config.automatic_threshold:
-            if not self.stats["user"]:
-                return 0
-
-            # Get the 25th percentile
-            uniq_totals = set(map(lambda i: i["total"], self.stats["user"].values()))
-            return sorted(uniq_totals)[int(len(uniq_totals) * 0.25)]  # type: ignore[no-any-return]  # Get the 25th percentile
+            return self.automatic_threshold("user")
         return self.config.user_threshold
 
+    def automatic_threshold(self, kind: Literal["user", "file"]) -> int:
+        """Calculate the 25th percentile of the unique user or file totals
+
+        The totals are taken from :meth:`sorted_stats` and the result is cached until
+        the statistics change.
+
+        .. versionadded:: 3.1.6 Added to share the traversal with the statistics tables.
+
+        Args:
+            kind (:obj:`str`): Either "user" or "file"
+
+        Returns:
+            :obj:`int`: The threshold, 0 if there are no statistics
+        """
+        version, threshold = self._threshold_cache.get(kind, (None, 0))
+        if version != self.stats_version:
+            version = self.stats_version
+            threshold = unique_percentile((data["total"] for _, data in self.sorted_stats(kind)), 0.25)
+            self._threshold_cache[kind] = (version, threshold)
+        return threshold
+
+    def sorted_stats(self, kind: Literal["user", "file"]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Get the user or file statistics sorted by total uploads
+
+        The result is cached until the statistics change.
+
+        .. versionadded:: 3.1.6 Shared by the statistics tables and rankings.
+
+        Args:
+            kind (:obj:`str`): Either "user" or "file"
+
+        Returns:
+            :obj:`List` of :obj:`Tuple`: Name and data pairs, most uploads first
+        """
+        version, items = self._sorted_cache.get(kind, (None, []))
+        if version != self.stats_version:
+            with self.stats_lock:
+                version = self.stats_version
+                items = list(self.stats[kind].items())
+            items.sort(key=lambda i: i[1]["total"], reverse=True)
+            self._sorted_cache[kind] = (version, items)
+        return items
+
     def user_stats(self, threshold: int = 0) -> str:
         """Create the user statistics table
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`sorted_stats` and fill a
+            preformatted row template instead of building each tag separately.
+
         Args:
             threshold (:obj:`int`, optional): Threshold to filter the users. Default is 0.
 
         Returns:
             :obj:`str`: HTML table
         """
+        return "".join(self.user_rows(threshold))
+
+    def user_rows(self, threshold: int = 0) -> Iterator[str]:
+        """Create the user statistics table rows one by one
+
+        .. versionadded:: 3.1.6 Added to stream the table with :meth:`render_html`. Names,
+            paths and tooltips are HTML escaped.
+
+        Args:
+            threshold (:obj:`int`, optional): Threshold to filter the users. Default is 0.
+
+        Yields:
+            :obj:`str`: HTML table row
+        """
         self.log.debug(f"Building user stats with threshold {threshold}")
-        html = ""
 
-        # Sort by total uploads
-        for username, user_data in sorted(self.stats["user"].items(), key=lambda i: i[1]["total"], reverse=True):
+        for username, user_data in self.sorted_stats("user"):
             if user_data["total"] <= threshold:
-                continue
-
-            filename = a(
-                Path(user_data["last_file"]).name,
-                href="#file-" + id_string(user_data["last_real_file"]),
-                data_tooltip=f'RP: {user_data["last_real_file"]}\nVP: {user_data["last_file"]}',
-                data_tooltip_align="left",
-            )
+                break
 
             total_bytes_raw = total_bytes = "-"
             if total_bytes_raw := user_data.get("total_bytes"):  # type: ignore[assignment]
                 total_bytes = readable_size_html(total_bytes_raw)
 
-            html += f"""
-            <tr id="user-{id_string(username)}">
-                <td>{username}</td>
-                <td>{user_data["total"]}</td>
-                <td sorttable_customkey="{total_bytes_raw}">{total_bytes}</td>
-                <td>{filename}</td>
-            </tr>"""
-        return html
+            tooltip = escape(f'RP: {user_data["last_real_file"]}\nVP: {user_data["last_file"]}')
+            yield _USER_ROW % (
+                id_string(username),
+                escape(username),
+                user_data["total"],
+                total_bytes_raw,
+                total_bytes,
+                id_string(user_data["last_real_file"]),
+                tooltip,
+                tooltip,
+                self.html_name(user_data["last_file"]),
+            )
 
     def file_threshold(self) -> int:
         """Calculate the file threshold
@@ -634,42 +1207,46 @@ class Plugin(BasePlugin):
         If automatic_threshold is enabled, the 25th percentile is used as the threshold,
         unless the file stats are empty, then 0 is returned.
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`automatic_threshold`.
+
         Returns:
             int: The file threshold
         """
         if self.config.automatic_threshold:
-            if not self.stats["file"]:
-                return 0
-
-            # Get the 25th percentile
-            uniq_totals = set(map(lambda i: i["total"], self.stats["file"].values()))
-            return sorted(uniq_totals)[int(len(uniq_totals) * 0.25)]  # type: ignore[no-any-return]  # Get the 25th percentile
+            return self.automatic_threshold("file")
         return self.config.file_threshold
 
     def file_stats(self, threshold: int = 0) -> str:
         """Create the file statistics table
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`sorted_stats` and fill a
+            preformatted row template instead of building each tag separately.
+
         Args:
             threshold (:obj:`int`, optional): Threshold to filter the files. Default is 0.
 
         Returns:
             :obj:`str`: HTML table
         """
+        return "".join(self.file_rows(threshold))
+
+    def file_rows(self, threshold: int = 0) -> Iterator[str]:
+        """Create the file statistics table rows one by one
+
+        .. versionadded:: 3.1.6 Added to stream the table with :meth:`render_html`. Names,
+            paths and tooltips are HTML escaped.
+
+        Args:
+            threshold (:obj:`int`, optional): Threshold to filter the files. Default is 0.
+
+        Yields:
+            :obj:`str`: HTML table row
+        """
         self.log.debug(f"Building file stats with threshold {threshold}")
-        html = ""
 
-        # Sort by total uploads
-        for file_path, file_data in sorted(self.stats["file"].items(), key=lambda i: i[1]["total"], reverse=True):
+        for file_path, file_data in self.sorted_stats("file"):
             if file_data["total"] <= threshold:
-                continue
-
-            name = a(
-                Path(file_path).name,
-                data_tooltip=f'RP: {file_path}\nVP: {file_data["virtual_path"]}',
-                href="file:///" + file_path,
-                target="_blank",
-                data_tooltip_align="left",
-            )
+                break
 
             total_bytes_raw = total_bytes = "-"
             if total_bytes_raw := file_data.get("total_bytes"):  # type: ignore[assignment]
@@ -679,21 +1256,63 @@ class Plugin(BasePlugin):
             if file_size_raw := file_data.get("file_size"):  # type: ignore[assignment]
                 file_size = readable_size_html(file_size_raw)
 
-            last_user = a(file_data["last_user"], href="#user-" + id_string(file_data["last_user"]))
+            tooltip = escape(f'RP: {file_path}\nVP: {file_data["virtual_path"]}')
+            yield _FILE_ROW % (
+                id_string(file_path),
+                tooltip,
+                escape(file_path),
+                tooltip,
+                self.html_name(file_path),
+                file_data["total"],
+                total_bytes_raw,
+                total_bytes,
+                file_size_raw,
+                file_size,
+                id_string(file_data["last_user"]),
+                escape(file_data["last_user"]),
+            )
 
-            html += f"""
-            <tr id="file-{id_string(file_path)}">
-                <td>{name}</td>
-                <td>{file_data["total"]}</td>
-                <td sorttable_customkey="{total_bytes_raw}">{total_bytes}</td>
-                <td sorttable_customkey="{file_size_raw}">{file_size}</td>
-                <td>{last_user}</td>
-            </tr>"""
-        return html
+    def path_name(self, path: str) -> str:
+        """Get the file name of a path
+
+        .. versionadded:: 3.1.6 Added to cache file names across builds.
+
+        Args:
+            path (:obj:`str`): File path
+
+        Returns:
+            :obj:`str`: File name
+        """
+        if (name := self._name_cache.get(path)) is None:
+            name = self._name_cache[path] = Path(path).name
+        return name
+
+    def html_name(self, path: str) -> str:
+        """Get the HTML escaped file name of a path
+
+        .. versionadded:: 3.1.6 Added to cache the escaped file names for the statistics
+            tables across builds.
+
+        Args:
+            path (:obj:`str`): File path
+
+        Returns:
+            :obj:`str`: HTML escaped file name
+        """
+        if (name := self._html_name_cache.get(path)) is None:
+            name = self._html_name_cache[path] = escape(self.path_name(path))
+        return name
 
     def file_link(self, file: Union[str, Path], as_base64: bool = False) -> str:
         """Create a file link
 
+        .. versionchanged:: 3.1.6 The base64 data link is encoded in chunks and only
+            used for files up to :attr:`BASE64_MAX_SIZE`, larger files fall back to a
+            regular file link.
+
+        .. versionchanged:: 3.1.6 The base64 data link is cached until the file is
+            modified.
+
         Args:
             file (:obj:`str` | :obj:`pathlib.Path`): File path
             as_base64 (:obj:`bool`, optional): Instead of a file link, use a base64 data
@@ -705,76 +1324,127 @@ class Plugin(BasePlugin):
         file = Path(file)
         href = f"file:///{file}"
 
-        if as_base64:
-            b64 = urlsafe_b64encode(file.read_bytes()).decode("utf-8")
-            href = f"data:application/octet-stream;base64,{b64}"
+        if as_base64 and (stat := file.stat()).st_size <= self.BASE64_MAX_SIZE:
+            cached = self._base64_cache.get(str(file))
+            if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+                href = cached[2]
+            else:
+                chunks: List[bytes] = []
+                with file.open("rb") as f:
+                    # Chunk size has to be a multiple of 3 to avoid padding in between chunks
+                    while chunk := f.read(57 * 1024):
+                        chunks.append(urlsafe_b64encode(chunk))
+                href = "data:application/octet-stream;base64," + b"".join(chunks).decode("ascii")
+                self._base64_cache[str(file)] = (stat.st_mtime, stat.st_size, href)
 
-        return a(file.name, href=href, data_tooltip=file, target="_blank", download=file.name)
+        return a(escape(file.name), href=href, data_tooltip=file, target="_blank", download=file.name)
 
     def ranking(self, data: List[Tuple[str, int, str]], size: int = 5) -> str:
         """Create a ranking list
 
+        .. versionchanged:: 3.1.6 Titles are HTML escaped.
+
+        .. versionchanged:: 3.1.6 The data is no longer sorted, it is expected in order
+            already.
+
         Args:
-            data (:obj:`List` of :obj:`Tuple`): Ranking data
+            data (:obj:`List` of :obj:`Tuple`): Ranking data, sorted by score
             size (:obj:`int`, optional): Number of items to show. Default is 5.
 
         Returns:
             :obj:`str`: HTML list
         """
-        html = ""
-        data = sorted(data, key=lambda i: i[1], reverse=True)
+        items: List[str] = []
         for index in range(size):
             score: Union[str, int]
             title = score = "-"
             link_id = None
             if len(data) >= index + 1:
                 title, score, link_id = data[index]
-            html += li(a(small(f"{score} ") + span(span(title)), href=link_id or "#"))
-        return html
+            items.append(li(a(small(f"{score} ") + span(span(escape(title))), href=link_id or "#")))
+        return "".join(items)
 
-    def user_ranking(self) -> str:
+    def user_ranking(self, size: int = 5) -> str:
         """Create a user ranking list
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`sorted_stats`.
+
+        Args:
+            size (:obj:`int`, optional): Number of items to show. Default is 5.
+
         Returns:
             :obj:`str`: HTML list
         """
         data: List[Tuple[str, int, str]] = [
-            (name, user["total"], "#user-" + id_string(name)) for name, user in self.stats["user"].items()
+            (name, user["total"], "#user-" + id_string(name)) for name, user in self.sorted_stats("user")[:size]
         ]
-        return self.ranking(data)
+        return self.ranking(data, size)
 
-    def file_ranking(self) -> str:
+    def file_ranking(self, size: int = 5) -> str:
         """Create a file ranking list
 
+        .. versionchanged:: 3.1.6 Use the cached :meth:`sorted_stats`.
+
+        Args:
+            size (:obj:`int`, optional): Number of items to show. Default is 5.
+
         Returns:
             :obj:`str`: HTML list
         """
         data: List[Tuple[str, int, str]] = [
-            (Path(path).name, file["total"], "#file-" + id_string(path)) for path, file in self.stats["file"].items()
+            (self.path_name(path), file["total"], "#file-" + id_string(path))
+            for path, file in self.sorted_stats("file")[:size]
         ]
-        return self.ranking(data)
+        return self.ranking(data, size)
+
+    def check_latest_version(self) -> None:
+        """Check for a new version and store it in :attr:`latest_version`
+
+        .. versionadded:: 3.1.6 Run periodically by :attr:`update_checker` so building
+            the statistics page doesn't block on the network.
+        """
+        self.log.debug("Checking for a new version")
+        latest_version = self._check_update()
+        if latest_version != self.latest_version:
+            # Make sure the next build shows the update notice
+            self._built_version = None
+        self.latest_version = latest_version
+        self._update_checked = True
 
     def icons(self) -> str:
         """Create CSS for all icons in the images folder
 
         .. versionchanged:: 3.1.2 Fixed path to images. Making icons work again.
 
+        .. versionchanged:: 3.1.6 Use :data:`upload_stats.defaults.REL_HTML_URL` instead
+            of replacing backslashes in the whole CSS. Use :func:`os.scandir` instead of
+            globbing.
+
         Returns:
             :obj:`str`: CSS for all icons
         """
-        icons = ""
-        for icon in (HTML_PATH / "images").glob("*.svg"):
-            icons += f'.icon-{icon.stem} {{ background-image: url("{REL_HTML_PATH}/images/{icon.name}"); }}'
-        return tag("style", icons.replace("\\", "/"))
+        with os.scandir(HTML_PATH / "images") as entries:
+            icons = "".join(
+                f'.icon-{entry.name[:-4]} {{ background-image: url("{REL_HTML_URL}/images/{entry.name}"); }}'
+                for entry in entries
+                if entry.name.endswith(".svg")
+            )
+        return tag("style", icons)
 
     ### === Events ===
 
     def pre_stop(self) -> None:
         """Stop all jobs before stopping the plugin"""
         self.log.debug("Stopping all jobs")
+        if self._save_timer:
+            self._save_timer.cancel()
+        self.flush_stats()
         self.backup("stop")
         self.auto_update.stop()
+        self.auto_backup.stop(False)
         self.auto_builder.stop(False)
+        self.update_checker.stop(False)
+        self.writer.stop()
 
     def upload_finished_notification(self, user: str, virtual_path: str, real_path: str) -> None:
         """Event: Upload finished
@@ -792,59 +1462,84 @@ class Plugin(BasePlugin):
     def track_file_upload(self, user: str, virtual_path: str, real_path: str) -> None:
         """Track a file upload in the statistics
 
+        .. versionchanged:: 3.1.6 The statistics are no longer saved after every
+            upload, see :meth:`request_save`.
+
+        .. versionchanged:: 3.1.6 The known size and modification time of the file are
+            used if it can not be read anymore, instead of resetting the total bytes.
+
+        .. versionchanged:: 3.1.6 The upload is appended to the journal, see
+            :meth:`journal_upload`.
+
         Args:
             user (:obj:`str`): User who uploaded the file
             virtual_path (:obj:`str`): Virtual path of the file
             real_path (:obj:`str`): Real path of the file
         """
         self.log.info(f"Tracking file upload: {virtual_path} to {user} at {real_path}")
-        file_info = self.stats["file"].get(real_path, {})
-        user_info = self.stats["user"].get(user, {})
-
+        # The file may have been replaced since the last upload, so it is looked up every
+        # time. The known values are only used if it can not be read.
+        stat: Optional[os.stat_result] = None
         try:
-            stat = Path(real_path).stat()
+            stat = os.stat(real_path)
         except FileNotFoundError:
             self.log.warning(f'File "{real_path}" not found')
-            stat = None
-        except Exception as e:
+        except OSError as e:
             self.log.warning(f'Could not get file info for "{real_path}": {e}')
-            stat = None
 
-        weekday = datetime.now().weekday()
+        weekday = time.localtime().tm_wday
 
-        # Increment uploads per day counter
-        self.stats["day"][weekday] = self.stats["day"][weekday] + 1
+        with self.stats_lock:
+            file_info = self.stats["file"].get(real_path, {})
+            user_info = self.stats["user"].get(user, {})
 
-        # Update file statistics
-        self.stats["file"][real_path] = {
-            "total": file_info.get("total", 0) + 1,
-            "virtual_path": virtual_path,
-            "last_user": user,
-            "last_modified": stat.st_mtime if stat else 0,
-            "file_size": stat.st_size if stat else 0,
-            "total_bytes": file_info.get("total_bytes", 0) + stat.st_size if stat else 0,
-        }
+            file_size: int = file_info.get("file_size", 0)
+            last_modified: float = file_info.get("last_modified", 0)
+            if stat and (stat.st_mtime != last_modified or not file_size):
+                file_size, last_modified = stat.st_size, stat.st_mtime
 
-        # Update user statistics
-        self.stats["user"][user] = {
-            "total": user_info.get("total", 0) + 1,
-            "last_file": virtual_path,
-            "last_real_file": real_path,
-            "total_bytes": user_info.get("total_bytes", 0) + stat.st_size if stat else 0,
-        }
-        self.save_stats()
+            # Increment uploads per day counter
+            self.stats["day"][weekday] = self.stats["day"][weekday] + 1
+
+            # Update file statistics
+            self.stats["file"][real_path] = {
+                "total": file_info.get("total", 0) + 1,
+                "virtual_path": virtual_path,
+                "last_user": user,
+                "last_modified": last_modified,
+                "file_size": file_size,
+                "total_bytes": file_info.get("total_bytes", 0) + file_size,
+            }
+
+            # Update user statistics
+            self.stats["user"][user] = {
+                "total": user_info.get("total", 0) + 1,
+                "last_file": virtual_path,
+                "last_real_file": real_path,
+                "total_bytes": user_info.get("total_bytes", 0) + file_size,
+            }
+            self.stats_version += 1
+            self._update_top_files(real_path, self.stats["file"][real_path]["total"])
+            self.journal_upload(user, real_path, weekday)
+
+        self.write_journal()
+        self.request_save()
 
     def settings_changed(self, before: Settings, after: Settings, change: SettingsDiff) -> None:
         """Event: Settings changed
 
         .. versionadded:: 3.1.2 Rebuild page on theme change.
 
+        .. versionchanged:: 3.1.6 Any other change is picked up by the next build of the
+            statistics page, even if the statistics did not change.
+
         Args:
             before (:obj:`npc.Settings`): Settings before the change
             after (:obj:`npc.Settings`): Settings after the change
             change (:obj:`npc.SettingsDiff`): Changed settings
         """
         super().settings_changed(before, after, change)
+        self._built_version = None
 
         if "dark_theme" in change["after"]:
-            self.rebuild_page()
+            self.rebuild_page(force=True)
@@ -1,10 +1,269 @@
 """This module contins utility functions."""
 
+import json
+import logging
+import mmap
+import os
+import threading
 from mimetypes import guess_type
 from pathlib import Path
-from typing import List, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
-__all__ = ["create_m3u"]
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+__all__ = [
+    "AsyncWriter",
+    "atomic_write",
+    "create_m3u",
+    "dump_json",
+    "is_audio",
+    "load_json",
+    "read_json",
+    "unique_percentile",
+]
+
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+""":obj:`int`: Minimum file size in bytes for :func:`read_json` to map the file into memory"""
+
+
+def dump_json(obj: Any) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON
+
+    Uses :mod:`orjson` if it is installed, falls back to :mod:`json` otherwise.
+
+    .. versionadded:: 3.1.6 Added to speed up saving the statistics.
+
+    Args:
+        obj (:obj:`typing.Any`): Object to serialize
+
+    Returns:
+        :obj:`bytes`: JSON data
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def load_json(data: Union[str, bytes]) -> Any:
+    """Deserialize JSON data
+
+    Uses :mod:`orjson` if it is installed, falls back to :mod:`json` otherwise.
+
+    .. versionadded:: 3.1.6 Added to speed up loading the statistics.
+
+    Args:
+        data (:obj:`str` | :obj:`bytes`): JSON data
+
+    Returns:
+        :obj:`typing.Any`: Deserialized object
+
+    Raises:
+        :obj:`json.JSONDecodeError`: If the data is not valid JSON
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """Deserialize a JSON file
+
+    With :mod:`orjson` installed, files of at least :data:`MMAP_MIN_SIZE` bytes are
+    parsed directly from a memory map instead of being copied into memory first.
+
+    .. versionadded:: 3.1.6 Added to lower the memory usage while loading large statistics.
+
+    Args:
+        path (:obj:`str` | :obj:`pathlib.Path`): JSON file
+
+    Returns:
+        :obj:`typing.Any`: Deserialized object
+
+    Raises:
+        :obj:`json.JSONDecodeError`: If the file is not valid JSON
+    """
+    path = Path(path)
+    if orjson and path.stat().st_size >= MMAP_MIN_SIZE:
+        with path.open("rb") as file:
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass  # Not every file system supports memory maps
+            else:
+                # The view is released before the map is closed
+                with mapped, memoryview(mapped) as view:
+                    return orjson.loads(view)
+    return load_json(path.read_bytes())
+
+
+def atomic_write(path: Union[str, Path], data: bytes) -> None:
+    """Write data to a file atomically.
+
+    The data is written to a temporary file next to the target which then replaces
+    the target. This way the target is never left truncated, even if the process
+    dies mid-write.
+
+    .. versionadded:: 3.1.6 Added to prevent corrupted statistics files.
+
+    Args:
+        path (:obj:`str` | :obj:`pathlib.Path`): Output file path.
+        data (:obj:`bytes`): Data to write.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+class AsyncWriter:
+    """Write files atomically in a background thread.
+
+    Writes to the same path are coalesced, so only the latest data queued for a path
+    is written to disk.
+
+    Example:
+
+        .. code-block:: python
+
+            writer = AsyncWriter()
+            writer.start()
+            writer.write(Path("stats.json"), b"{}")
+            writer.stop()  # Writes all pending data before stopping
+
+    Failed writes are logged and queued again, unless newer data for the same path is
+    already waiting. They are retried with the next write or flush.
+
+    .. versionadded:: 3.1.6 Added to move disk I/O off the upload hot path.
+
+    Args:
+        name (:obj:`str`, optional): Name of the thread. Default is "AsyncWriter".
+        log (:obj:`logging.Logger`, optional): Logger for failed writes. Default is the
+            logger of this module.
+    """
+
+    def __init__(self, name: str = "AsyncWriter", log: Optional[Any] = None) -> None:
+        self.name = name
+        self.log = log or logging.getLogger(__name__)
+        self._pending: Dict[Path, bytes] = {}
+        self._callbacks: Dict[Path, List[Callable[[], Any]]] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._event = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def write(self, path: Path, data: bytes, callback: Optional[Callable[[], Any]] = None) -> None:
+        """Queue data to be written to a file
+
+        If the writer is not running, the data is written immediately.
+
+        Args:
+            path (:obj:`pathlib.Path`): Output file path.
+            data (:obj:`bytes`): Data to write.
+            callback (:obj:`typing.Callable`, optional): Called in the writer thread once
+                the data, or newer data for the same path, is written. Default is None.
+        """
+        with self._lock:
+            self._pending[path] = data
+            if callback:
+                self._callbacks.setdefault(path, []).append(callback)
+        if self._running:
+            self._event.set()
+        else:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all pending data in the calling thread"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                callbacks, self._callbacks = self._callbacks, {}
+            for path, data in pending.items():
+                try:
+                    atomic_write(path, data)
+                except Exception as e:
+                    self.log.error(f'Could not write "{path}": {e}')
+                    with self._lock:
+                        # Keep the failed data unless newer data is already waiting
+                        self._pending.setdefault(path, data)
+                        self._callbacks[path] = callbacks.get(path, []) + self._callbacks.get(path, [])
+                    continue
+
+                for callback in callbacks.get(path, []):
+                    try:
+                        callback()
+                    except Exception as e:
+                        self.log.error(f'Callback after writing "{path}" failed: {e}')
+
+    def stop(self) -> None:
+        """Stop the writer thread and write all pending data"""
+        self._running = False
+        self._event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while self._running:
+            self._event.wait()
+            self._event.clear()
+            self.flush()
+
+
+def is_audio(file: str) -> bool:
+    """Check if the given file is an audio file based on its name.
+
+    .. versionadded:: 3.1.6 Added to share the audio check between the playlist builders.
+
+    Args:
+        file (:obj:`str`): File path or name
+
+    Returns:
+        :obj:`bool`: True if the file is an audio file, False otherwise.
+    """
+    type = guess_type(file)[0]
+    return bool(type and type.startswith("audio"))
+
+
+def unique_percentile(values: Iterable[int], percent: float) -> int:
+    """Get the value at the given percentile of the unique values
+
+    Example:
+
+        .. code-block:: python
+
+            print(unique_percentile([1, 1, 1, 2, 3, 4], 0.25))
+            # Output: 1
+
+    .. versionadded:: 3.1.6 Added to share the threshold calculation.
+
+    Args:
+        values (:obj:`typing.Iterable` of :obj:`int`): Values to get the percentile from.
+        percent (:obj:`float`): Percentile between 0 and 1.
+
+    Returns:
+        :obj:`int`: Value at the given percentile, 0 if there are no values.
+    """
+    unique = sorted(set(values))
+    if not unique:
+        return 0
+    return unique[int(len(unique) * percent)]
 
 
 def create_m3u(title: str, files: List[str], out_file: Union[str, Path], max_files: int = -1) -> None:
@@ -15,15 +274,16 @@ def create_m3u(title: str, files: List[str], out_file: Union[str, Path], max_fil
         files (:obj:`List` of :obj:`str`): List of files to add to the playlist.
         out_file (:obj:`str` | :obj:`Path`): Output file path.
         max_files (:obj:`int`, optional): Maximum number of files to add to the playlist. Default is -1 (all files).
+
+    .. versionchanged:: 3.1.6 Lines are collected in a list and joined once.
     """
-    m3u = f"#EXTM3U\n#EXTENC: UTF-8\n#PLAYLIST: {title}\n"
+    lines = ["#EXTM3U", "#EXTENC: UTF-8", f"#PLAYLIST: {title}"]
     total = 0
     for file in files:
-        type = guess_type(file)[0]
-        if type and type.startswith("audio"):
-            m3u += file + "\n"
+        if is_audio(file):
+            lines.append(file)
             total += 1
         if total == max_files:
             break
 
-    Path(out_file).write_text(m3u, encoding="utf-8")
+    Path(out_file).write_text("\n".join(lines) + "\n", encoding="utf-8")